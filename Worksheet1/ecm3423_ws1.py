@@ -1,5 +1,19 @@
 # imports all openGL functions
 from OpenGL.GL import *
+from OpenGL.GL.shaders import compileProgram, compileShader
+
+# older versions of OpenGL only offer instanced drawing through these extensions
+from OpenGL.GL.ARB.instanced_arrays import glVertexAttribDivisorARB
+from OpenGL.GL.ARB.draw_instanced import glDrawArraysInstancedARB
+
+# used to give OpenGL byte offsets into a vertex buffer
+import ctypes
+
+# used to time each frame
+import time
+
+# the scene is moved around on a separate thread from the one drawing it
+import threading
 
 # pygame is just used to create a window with the operating system on which to draw.
 import pygame
@@ -7,10 +21,36 @@ import pygame
 # we will use numpy to store data in arrays
 import numpy as np
 
-x_offset, y_offset, z_offset = 0, 0, 0
+# triangles used several times by the House, shared rather than created for each component
+_WALL_TRI = np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], np.float32)
+_CHIMNEY_TRI = np.array([[0.0, 0.0, 0.0], [1.0, 1.5, 0.0], [0.0, 1.5, 0.0]], np.float32)
+
+
+def _rotz(angle):
+    '''
+    Builds the matrix rotating points about the z axis, as done by glRotate(angle, 0, 0, 1).
+    :param angle: The angle of rotation, in degrees
+    :return: a 3x3 float32 numpy array
+    '''
+    c, s = np.cos(np.deg2rad(angle)), np.sin(np.deg2rad(angle))
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=np.float32)
+
 
-gameClock = pygame.time.Clock()
-deltaTime = 16.66
+# the models only use a handful of orientations, so their rotations are computed once here
+_R_0 = np.eye(3, dtype=np.float32)
+_R_M45 = _rotz(-45)
+_R_180 = _rotz(180)
+_ROTATIONS = {0: _R_0, -45: _R_M45, 180: _R_180, -180: _R_180}
+
+
+def _rotation(angle):
+    '''
+    Looks up the rotation about the z axis for one of the common angles, computing any other.
+    :param angle: The angle of rotation, in degrees
+    :return: a 3x3 float32 numpy array, which must not be modified
+    '''
+    rotation = _ROTATIONS.get(angle)
+    return rotation if rotation is not None else _rotz(angle)
 
 
 class Scene:
@@ -18,6 +58,14 @@ class Scene:
     This is the main class for drawing an OpenGL scene using the PyGame library
     '''
 
+    # the direction in which holding each arrow key moves the scene
+    key_directions = {
+        pygame.K_UP: np.array([0, -1, 0], dtype=np.float32),
+        pygame.K_DOWN: np.array([0, 1, 0], dtype=np.float32),
+        pygame.K_LEFT: np.array([1, 0, 0], dtype=np.float32),
+        pygame.K_RIGHT: np.array([-1, 0, 0], dtype=np.float32)
+    }
+
     def __init__(self):
         '''
         Initialises the scene
@@ -28,23 +76,64 @@ class Scene:
         pygame.init()
         screen = pygame.display.set_mode((800, 600), pygame.OPENGL | pygame.DOUBLEBUF, 24)
 
+        # the keyboard is read through its state rather than through events, so only the events
+        # we handle are let into the queue, where they would otherwise pile up unread
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT, pygame.VIDEOEXPOSE])
+
         # Here we start initialising the window from the OpenGL side
         glViewport(0, 0, 800, 600)
 
         # this selects the background colour
         glClearColor(0.0, 0.5, 0.5, 1.0)
 
-        # This class will maintain a list of models to draw in the scene,
-        # we will initalise it to empty
-        self.models = []
+        # every triangle has a single colour, so there is nothing to interpolate across it
+        glShadeModel(GL_FLAT)
+
+        # This class will maintain the models to draw in the scene, grouped by their geometry: all
+        # models of one shape are drawn together by a single InstancedModel. We will initalise it to empty
+        self.models = {}
+
+        # the offset applied to the whole scene as it is moved around with the arrow keys.
+        # It is written by the update thread and read by the drawing thread.
+        self.offset = np.zeros(3, dtype=np.float32)
+
+        # the state of the keyboard, read by the drawing thread for the update thread
+        self._keys = pygame.key.get_pressed()
+
+        # set whenever the scene has changed since it was last drawn, ...
+        self._changed = threading.Event()
+        self._changed.set()
+
+        # ... while an arrow key is held, to wake the update thread, ...
+        self._moving = threading.Event()
+
+        # ... and once the window is closed, to stop the update thread
+        self._stop = threading.Event()
 
     def add_model(self, model):
         '''
-        This method just adds a model to the scene.
+        This method just adds a model to the scene. Models with the same geometry, colours and
+        orientation are drawn together as copies of each other.
         :param model: The model object to add to the scene
         :return: None
         '''
-        self.models.append(model)
+        self.add_instances(model, [model.position], model.scale)
+
+    def add_instances(self, template, positions, scale=1):
+        '''
+        Adds many copies of a model to the scene at once.
+        :param template: A model giving the geometry of the copies
+        :param positions: An array with one row of (x, y) or (x, y, z) coordinates per copy
+        :param scale: The scale factor of the copies
+        :return: None
+        '''
+        # models are batched by everything the copies share, so that no two shapes are mixed up
+        key = (type(template), template.orientation, template.vertices.tobytes(), template.colors.tobytes())
+        if key not in self.models:
+            self.models[key] = InstancedModel(template)
+        self.models[key].add_instances(positions, scale)
+        self._changed.set()
 
     def draw(self):
         '''
@@ -55,8 +144,16 @@ class Scene:
     # first we need to clear the scene
         glClear(GL_COLOR_BUFFER_BIT)
 
-    # then we loop over all models in the list and draw them
-        for model in self.models:
+    # the scene offset is applied once per frame, from a fresh modelview matrix, for all models.
+    # We take a copy, as the update thread may move the scene while we are drawing it.
+        offset = self.offset.copy()
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        glTranslatef(*offset)
+
+    # then we loop over all models in the scene and draw those copies that can be seen
+        for model in self.models.values():
+            model.cull(offset)
             model.draw()
 
     # once we are done drawing, we display the scene
@@ -65,40 +162,114 @@ class Scene:
     # and flip the two buffers once we are done drawing.
         pygame.display.flip()
 
-    def handleInput(self):
+    def handleInput(self, dt):
         '''
         Register pyGame movement inputs
+        :param dt: The time elapsed since the previous update, in nanoseconds
+        '''
+        keys = self._keys
+
+        # the scene moves by 0.25 units per second
+        step = 0.25e-9 * dt
+        for key, direction in self.key_directions.items():
+            if keys[key]:
+                self.offset += direction * step
+                self._changed.set()
+
+    def _update_loop(self):
         '''
-        global x_offset, y_offset, z_offset, deltaTime
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_UP]:
-            y_offset = y_offset - 0.25 * deltaTime
-        if keys[pygame.K_DOWN]:
-            y_offset = y_offset + 0.25 * deltaTime
-        if keys[pygame.K_LEFT]:
-            x_offset = x_offset + 0.25 * deltaTime
-        if keys[pygame.K_RIGHT]:
-            x_offset = x_offset - 0.25 * deltaTime
+        Moves the scene according to the keys held down, about once every millisecond while any
+        arrow key is held, until the window is closed. This runs on its own thread, started by run().
+        '''
+        handleInput, perf_counter_ns = self.handleInput, time.perf_counter_ns
+        moving, stop = self._moving, self._stop
+
+        while True:
+            # sleep until a key is pressed, or the window is closed
+            moving.wait()
+            if stop.is_set():
+                return
+
+            last = perf_counter_ns()
+            while moving.is_set() and not stop.wait(0.001):
+                now = perf_counter_ns()
+                handleInput(now - last)
+                last = now
 
     def run(self):
         '''
-        Draws the scene in a loop until exit.
+        Draws the scene in a loop until exit. The scene is moved on a separate update thread, while
+        all pygame and OpenGL calls stay on this one, which created the window and its context.
         '''
+        updater = threading.Thread(target=self._update_loop)
+        updater.start()
 
-        global deltaTime, gameClock 
+        # the loop below runs every frame, so we look up everything it calls only once
+        draw, changed, moving = self.draw, self._changed, self._moving
+        arrows = tuple(self.key_directions)
+        event_peek, event_get, get_pressed = pygame.event.peek, pygame.event.get, pygame.key.get_pressed
+        QUIT, VIDEOEXPOSE = pygame.QUIT, pygame.VIDEOEXPOSE
+        watched = (QUIT, VIDEOEXPOSE)
 
         # We have a classic program loop
         running = True
-        while running:
-            # check whether the window has been closed
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-            # otherwise, continue drawing
-            self.draw()
-            self.handleInput()
-            gameClock.tick()
-            deltaTime = gameClock.get_time()/1000
+        try:
+            while running:
+                # check whether the window has been closed. Peeking also keeps the window
+                # responsive, and unlike fetching the events it does not build a list every frame.
+                if event_peek(watched):
+                    for event in event_get():
+                        if event.type == QUIT:
+                            running = False
+                        elif event.type == VIDEOEXPOSE:
+                            # the window needs its contents drawn again
+                            changed.set()
+
+                # hand the keyboard state over to the update thread, waking it while an arrow
+                # key is held
+                keys = self._keys = get_pressed()
+                if any(keys[key] for key in arrows):
+                    moving.set()
+                else:
+                    moving.clear()
+
+                # otherwise, wait for the scene to change and draw it. We only wait briefly so
+                # that window events and key presses keep being handled, and a little longer
+                # while nothing moves.
+                if changed.wait(0.001 if moving.is_set() else 0.01):
+                    # cleared before drawing, so that a change made meanwhile is drawn next frame
+                    changed.clear()
+                    draw()
+        finally:
+            self._stop.set()
+            moving.set()
+            updater.join()
+
+
+def _bake(components):
+    '''
+    Applies the pose of each component to its vertices with numpy, rather than with the OpenGL
+    matrix stack, writing the results one after the other into a single contiguous array.
+    :param components: The models to bake, each with its vertices and a colour per vertex
+    :return: a pair of (n, 3) float32 arrays, holding the vertex positions and their colours
+    '''
+    count = sum(component.vertices.shape[0] for component in components)
+    vertices = np.empty((count, 3), dtype=np.float32)
+    colors = np.empty((count, 3), dtype=np.float32)
+
+    start = 0
+    for component in components:
+        end = start + component.vertices.shape[0]
+
+        # the scale is folded into the rotation, so each vertex only needs one product
+        transform = component.scale * _rotation(component.orientation)
+
+        np.matmul(component.vertices, transform.T, out=vertices[start:end])
+        vertices[start:end] += component.position
+        colors[start:end] = component.colors
+        start = end
+
+    return vertices, colors
 
 
 class BaseModel:
@@ -124,18 +295,63 @@ class BaseModel:
         # ... and the scale factor
         self.scale = scale
 
+        # these never change, so we combine the translation, rotation and scaling into a single
+        # matrix once here. OpenGL expects matrices in column-major order, hence the transpose.
+        translation = np.eye(4, dtype=np.float32)
+        translation[:3, 3] = position
+        rotation = np.eye(4, dtype=np.float32)
+        rotation[:3, :3] = _rotation(orientation)
+        scaling = np.diag(np.array([scale, scale, scale, 1], dtype=np.float32))
+        self._mat = (translation @ rotation @ scaling).T.astype(np.float32, order='C')
+
+        # the buffer holding the model's vertices on the graphics card, created when first drawn
+        self._vbo = None
+
     def applyParameters(self):
 
-        # apply the position and orientation of the object
-        glTranslate(self.position[0] + x_offset, self.position[1] + y_offset, self.position[2] + z_offset)
-        glRotate(self.orientation, 0, 0, 1)
+        # apply the position, orientation and scale of the object in a single call. The colour is
+        # not set here, as every vertex is drawn with its own colour from the vertex buffer.
+        glMultMatrixf(self._mat)
+
+
+    def createVertexBuffer(self):
+        '''
+        Copies the model's vertices and their colours once into a buffer on the graphics card, from
+        which they are drawn every frame. This is done the first time the model is drawn, so that
+        models only used to build others never take up a buffer.
+        :return: None
+        '''
+
+        # each vertex takes 24 bytes in the buffer: 3 floats of position, then 3 of colour
+        interleaved = np.hstack([self.vertices, self.colors])
 
-        # apply scaling across all dimensions
-        glScale(self.scale, self.scale, self.scale)
+        self._n = interleaved.shape[0]
+        self._vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo)
+        glBufferData(GL_ARRAY_BUFFER, interleaved.nbytes, interleaved, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
-        # then set the colour
-        glColor(self.color)
+    def drawGeometry(self):
+        '''
+        Issues the OpenGL calls for the model's triangles, relative to its own pose
+        :return: None
+        '''
+
+        # Rather than entering the vertices one at a time, we point OpenGL at the buffer holding
+        # them and let it read all of them in one go. Each vertex's colour follows its position.
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 24, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, 24, ctypes.c_void_p(12))
+
+        # Here we will use the simple GL_TRIANGLES primitive, that will interpret each sequence of
+        # 3 vertices as defining a triangle.
+        glDrawArrays(GL_TRIANGLES, 0, self._n)
 
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
     def draw(self):
         '''
@@ -143,23 +359,15 @@ class BaseModel:
         :return:
         '''
 
+        if self._vbo is None:
+            self.createVertexBuffer()
+
         # saves the current pose parameters
         glPushMatrix()
 
         self.applyParameters()
 
-        # Here we will use the simple GL_TRIANGLES primitive, that will interpret each sequence of
-        # 3 vertices as defining a triangle.
-        glBegin(GL_TRIANGLES)
-
-        # we loop over all vertices in the model
-        for vertex in self.vertices:
-
-            # This function adds the vertex to the list
-            glVertex(vertex)
-
-        # the call to glEnd() signifies that all vertices have been entered.
-        glEnd()
+        self.drawGeometry()
 
         # retrieve the previous pose parameters
         glPopMatrix()
@@ -176,14 +384,19 @@ class TriangleModel(BaseModel):
 
         # each row encodes the coordinate for one vertex.
         # given that we are drawing in 2D, the last coordinate is always zero.
-        self.vertices = vertices
+        # OpenGL reads the array directly, so it must be a contiguous block of 32 bit floats.
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+
+        # the colour repeated for each vertex, as models are drawn with a colour per vertex
+        self.colors = np.tile(np.asarray(color, dtype=np.float32), (self.vertices.shape[0], 1))
+
 
 class Tree(BaseModel):
     def __init__(self, position=[0, 0, 0], orientation=0, scale=1):
         BaseModel.__init__(self, position=position, orientation=orientation, scale=scale)
 
         # list of simple components
-        self.components = [
+        components = [
             TriangleModel(position=[0, 0, 0], scale=0.5, orientation=-45, color=[0, 1, 0], vertices=np.array([[0.0, 1.0, 0.0], [0.0, 0.0, 0.0], [1.0, 1.0, 0.0]], 'f')),
             TriangleModel(position=[0, 0.25, 0], scale=0.5, orientation=-45, color=[0, 1, 0]),
             TriangleModel(position=[0, 0.5, 0], scale=0.5, orientation=-45, color=[0, 1, 0]),
@@ -191,17 +404,8 @@ class Tree(BaseModel):
             TriangleModel(position=[0.5, 0, 0], scale=0.25, orientation=-180, color=[0.6, 0.2, 0.2])
         ]
 
-    def draw(self):
-        glPushMatrix()
-
-        # apply the parameters for the whole model
-        self.applyParameters()
-
-        # draw all component primitives
-        for component in self.components:
-            component.draw()
-
-        glPopMatrix()
+        # the component poses never change, so we apply them once here and keep a single array
+        self.vertices, self.colors = _bake(components)
 
 
 class House(BaseModel):
@@ -210,40 +414,200 @@ class House(BaseModel):
 
         # list of simple components
         # House
-        self.components = [
-            TriangleModel(position=[0, -0.25, 0], scale=0.5, orientation=0, color=[0.8, 0.8, 0.8], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], 'f')),
-            TriangleModel(position=[0.5, 0.35, 0], scale=0.5, orientation=180, color=[0.8, 0.8, 0.8], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], 'f')),
-            TriangleModel(position=[0.025, 0.125, 0], scale=0.15, orientation=0, color=[0.2, 0.2, 0.6], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], 'f')),
-            TriangleModel(position=[0.175, 0.305, 0], scale=0.15, orientation=180, color=[0.2, 0.2, 0.6], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], 'f')),
-            TriangleModel(position=[0.325, 0.125, 0], scale=0.15, orientation=0, color=[0.2, 0.2, 0.6], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], 'f')),
-            TriangleModel(position=[0.475, 0.305, 0], scale=0.15, orientation=180, color=[0.2, 0.2, 0.6], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.2, 0.0], [0.0, 1.2, 0.0]], 'f')),
-            TriangleModel(position=[0.175, -0.25, 0.0], scale=0.15, orientation=0, color=[0.6, 0.2, 0.2], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.5, 0.0], [0.0, 1.5, 0.0]], 'f')),
-            TriangleModel(position=[0.325, -0.025, 0], scale=0.15, orientation=180, color=[0.6, 0.2, 0.2], vertices=np.array([[0.0, 0.0, 0.0], [1.0, 1.5, 0.0], [0.0, 1.5, 0.0]], 'f')),
+        components = [
+            TriangleModel(position=[0, -0.25, 0], scale=0.5, orientation=0, color=[0.8, 0.8, 0.8], vertices=_WALL_TRI),
+            TriangleModel(position=[0.5, 0.35, 0], scale=0.5, orientation=180, color=[0.8, 0.8, 0.8], vertices=_WALL_TRI),
+            TriangleModel(position=[0.025, 0.125, 0], scale=0.15, orientation=0, color=[0.2, 0.2, 0.6], vertices=_WALL_TRI),
+            TriangleModel(position=[0.175, 0.305, 0], scale=0.15, orientation=180, color=[0.2, 0.2, 0.6], vertices=_WALL_TRI),
+            TriangleModel(position=[0.325, 0.125, 0], scale=0.15, orientation=0, color=[0.2, 0.2, 0.6], vertices=_WALL_TRI),
+            TriangleModel(position=[0.475, 0.305, 0], scale=0.15, orientation=180, color=[0.2, 0.2, 0.6], vertices=_WALL_TRI),
+            TriangleModel(position=[0.175, -0.25, 0.0], scale=0.15, orientation=0, color=[0.6, 0.2, 0.2], vertices=_CHIMNEY_TRI),
+            TriangleModel(position=[0.325, -0.025, 0], scale=0.15, orientation=180, color=[0.6, 0.2, 0.2], vertices=_CHIMNEY_TRI),
             TriangleModel(position=[-0.05, 0.35, 0.0], scale=0.6, orientation=0, color=[0.9, 0.2, 0.2], vertices=np.array([[0.0, 0.0, 0.0], [0.5, 0.7, 0.0], [1.0, 0.0, 0.0]], 'f'))
         ]
 
-    def draw(self):
-        glPushMatrix()
+        # the component poses never change, so we apply them once here and keep a single array
+        self.vertices, self.colors = _bake(components)
 
-        # apply the parameters for the whole model
-        self.applyParameters()
 
-        # draw all component primitives
-        for component in self.components:
-            component.draw()
+# The instanced models use a small shader program: the vertex shader places each copy of the
+# template using its (x, y, z, scale) instance attribute, and the fragment shader just keeps
+# the colour given to each vertex.
+INSTANCE_VERTEX_SHADER = '''
+#version 120
+attribute vec4 instance;
 
-        glPopMatrix()
+void main()
+{
+    vec4 vertex = vec4(gl_Vertex.xyz * instance.w + instance.xyz, 1.0);
+    gl_Position = gl_ModelViewProjectionMatrix * vertex;
+    gl_FrontColor = gl_Color;
+}
+'''
+
+INSTANCE_FRAGMENT_SHADER = '''
+#version 120
+
+void main()
+{
+    gl_FragColor = gl_Color;
+}
+'''
+
+
+def _instancing_functions():
+    '''
+    Finds the OpenGL functions used for instanced drawing. They are only part of OpenGL from
+    version 3.3, so on older versions we look for the extensions providing them instead.
+    :return: a pair of (glVertexAttribDivisor, glDrawArraysInstanced), or None if either is missing
+    '''
+    divisor = glVertexAttribDivisor if bool(glVertexAttribDivisor) else glVertexAttribDivisorARB
+    draw_instanced = glDrawArraysInstanced if bool(glDrawArraysInstanced) else glDrawArraysInstancedARB
+    if not (bool(divisor) and bool(draw_instanced)):
+        return None
+    return divisor, draw_instanced
+
+
+class InstancedModel(BaseModel):
+    '''
+    Draws many copies of a template model with a single OpenGL call. The template's geometry is
+    uploaded once to a vertex buffer, and a second buffer holds the position and scale of each copy
+    that can currently be seen. Where OpenGL cannot draw instances, the copies are drawn one by one.
+    '''
+
+    # the instanced drawing functions and shader program are shared by all instanced models, and
+    # set up when the first is created. Both stay None if instanced drawing is not available.
+    initialised = False
+    instancing = None
+    program = None
+
+    def __init__(self, template):
+        BaseModel.__init__(self)
+
+        # the template's geometry, shared by all copies. Only their position and scale differ, so
+        # the template's orientation is applied to its vertices here.
+        self.vertices = template.vertices @ _rotation(template.orientation).T
+        self.colors = template.colors
+
+        # one (x, y, z, scale) row per copy, and the rows of the copies that can currently be
+        # seen, which are uploaded again whenever they change
+        self.instances = np.zeros((0, 4), dtype=np.float32)
+        self.visible = self.instances
+        self.stale = False
+
+        # which of the instances were found visible by the last call to cull()
+        self.mask = None
+
+        # the distance from the template's origin to its furthest vertex
+        self.radius = np.linalg.norm(self.vertices, axis=1).max()
+
+        if not InstancedModel.initialised:
+            InstancedModel.instancing = _instancing_functions()
+            if InstancedModel.instancing is not None:
+                InstancedModel.program = compileProgram(
+                    compileShader(INSTANCE_VERTEX_SHADER, GL_VERTEX_SHADER),
+                    compileShader(INSTANCE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER)
+                )
+            InstancedModel.initialised = True
+
+        if InstancedModel.instancing is not None:
+            self.instance_attrib = glGetAttribLocation(InstancedModel.program, 'instance')
+            self.instance_vbo = glGenBuffers(1)
+
+    def add_instances(self, positions, scale=1):
+        '''
+        Adds copies of the template to draw.
+        :param positions: An array with one row of (x, y) or (x, y, z) coordinates per copy
+        :param scale: The scale factor of the copies
+        :return: None
+        '''
+        positions = np.asarray(positions, dtype=np.float32)
+
+        # any missing z coordinate is left at zero
+        rows = np.zeros((positions.shape[0], 4), dtype=np.float32)
+        rows[:, :positions.shape[1]] = positions
+        rows[:, 3] = scale
+
+        self.instances = np.concatenate([self.instances, rows])
+        self.visible = self.instances
+        self.mask = None
+        self.stale = True
+
+    def cull(self, offset):
+        '''
+        Selects the copies that can be seen in the window once the scene is moved by the offset, so
+        that only those are drawn. The window shows coordinates between -1 and 1, to which we add a
+        small margin, and each copy is treated as a circle around its position.
+        :param offset: The offset applied to the whole scene
+        :return: None
+        '''
+        positions = self.instances
+        radii = self.radius * positions[:, 3]
+        visible = (np.abs(positions[:, 0] + offset[0]) < 1.1 + radii) & \
+                  (np.abs(positions[:, 1] + offset[1]) < 1.1 + radii)
+
+        # the copies to draw are only selected and uploaded again when they have changed
+        if self.mask is not None and np.array_equal(visible, self.mask):
+            return
+
+        self.mask = visible
+        self.visible = positions[visible]
+        self.stale = True
+
+    def drawGeometry(self):
+        if self.visible.shape[0] == 0:
+            return
+
+        if InstancedModel.instancing is None:
+            # without instanced drawing, each copy is moved into place and drawn on its own
+            for x, y, z, scale in self.visible:
+                glPushMatrix()
+                glTranslatef(x, y, z)
+                glScalef(scale, scale, scale)
+                BaseModel.drawGeometry(self)
+                glPopMatrix()
+            return
+
+        vertexAttribDivisor, drawArraysInstanced = InstancedModel.instancing
+
+        if self.stale:
+            glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.visible.nbytes, self.visible, GL_DYNAMIC_DRAW)
+            self.stale = False
+
+        glUseProgram(InstancedModel.program)
+
+        # each vertex takes 24 bytes in the buffer: 3 floats of position, then 3 of colour
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 24, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, 24, ctypes.c_void_p(12))
+
+        # the divisor makes the instance attribute advance once per copy rather than once per vertex
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glEnableVertexAttribArray(self.instance_attrib)
+        glVertexAttribPointer(self.instance_attrib, 4, GL_FLOAT, GL_FALSE, 0, None)
+        vertexAttribDivisor(self.instance_attrib, 1)
+
+        drawArraysInstanced(GL_TRIANGLES, 0, self._n, self.visible.shape[0])
+
+        glDisableVertexAttribArray(self.instance_attrib)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
 
 
 if __name__ == '__main__':
     # initialises the scene object
     scene = Scene()
 
-    # adds a few objects to the scene
-    for i in range(500):
-        scene.add_model(Tree(position=[np.random.uniform(-5, 5), np.random.uniform(-5, 5), 0], scale=0.2))
-    for i in range(20):
-        scene.add_model(House(position=[np.random.uniform(-5, 5), np.random.uniform(-5, 5), 0], scale=0.2))
+    # adds a few objects to the scene, picking all of their positions at once
+    tree_pos = np.random.uniform(-5, 5, size=(500, 2)).astype(np.float32)
+    house_pos = np.random.uniform(-5, 5, size=(20, 2)).astype(np.float32)
+    scene.add_instances(Tree(), tree_pos, scale=0.2)
+    scene.add_instances(House(), house_pos, scale=0.2)
 
     # starts drawing the scene
     scene.run()